@@ -0,0 +1 @@
+# Keeps the repository root on sys.path, so that tests can import the src package
@@ -26,32 +26,45 @@ SOFTWARE.
 import datetime
 import re
 import logging
+from typing import Tuple
 import discord
 from discord.ext import tasks
 from pbpstats.data_loader import DataNbaScheduleLoader
 
 from config import DISCORD_TOKEN_NBABOT, DISCORD_CHANNEL_ID_NBA, DISCORD_GUILD_NAME_NBA
+from src.discord_sender import DiscordSender
+from src.log_setup import ERROR_LOGGER_NAME, setup_logging
+from src.nba_live import LiveScoreTracker, NBALiveScoreSource
+from src.nba_standings import Standings, TeamRecord
 
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("logfile_nbabot.log", mode="a"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging("logfile_nbabot.log", error_filename="err.log", sample_rates={f"{__name__}.messages": 10})
 logger = logging.getLogger(__name__)
+# Per message logging is noisy, it is sampled by the logging setup
+message_logger = logging.getLogger(f"{__name__}.messages")
+error_logger = logging.getLogger(ERROR_LOGGER_NAME)
 
 
 client = discord.Client()
+sender = DiscordSender()
 
 games2021_22 = []
+# Every game of the season, including those played in 2022
+season_games = []
 schedule_loader = DataNbaScheduleLoader("nba", "2021-22", "Regular Season", "web")
 for schedule in schedule_loader.items:
-    if schedule.data["date"].startswith("2021"):
-        schedule.data["date"] = datetime.datetime.strptime(schedule.data["date"], "%Y-%m-%d")
+    schedule.data["date"] = datetime.datetime.strptime(schedule.data["date"], "%Y-%m-%d")
+    season_games.append(schedule.data)
+    if schedule.data["date"].year == 2021:
         games2021_22.append(schedule.data)
+games_by_id = {game.get("game_id"): game for game in season_games}
+
+standings = Standings()
+standings.add_games(season_games)
+
+live_tracker = LiveScoreTracker(NBALiveScoreSource())
+# game_id -> message holding that game's live score embed
+live_posts = {}
 
 
 @client.event
@@ -62,11 +75,7 @@ async def on_ready():
             break
 
 
-def format_last_game_message(game: dict) -> discord.Embed:
-    embeds = discord.Embed(title=f"🏀 {game['home_team_abbreviation']} vs {game['away_team_abbreviation']} 🏀")
-
-    embeds.add_field(name=f"Match Date", value=game["date"].strftime("%d %b %Y"), inline=False)
-
+def format_last_game_field(game: dict) -> Tuple[str, str]:
     if int(game["home_score"]) > int(game["away_score"]):
         winning_team_text = f"{game['home_team_abbreviation']} ({game['home_score']})"
         losing_team_text = f"{game['away_team_abbreviation']} ({game['away_score']})"
@@ -74,15 +83,47 @@ def format_last_game_message(game: dict) -> discord.Embed:
         winning_team_text = f"{game['away_team_abbreviation']} ({game['away_score']})"
         losing_team_text = f"{game['home_team_abbreviation']} ({game['home_score']})"
 
-    embeds.add_field(name="🏆 **Winners**", value=winning_team_text, inline=True)
-    embeds.add_field(name="😞 **Losers**", value=losing_team_text, inline=True)
+    name = f"🏀 {game['home_team_abbreviation']} vs {game['away_team_abbreviation']} 🏀"
+    value = f'{game["date"].strftime("%d %b %Y")}\n' \
+            f'🏆 **Winners** {winning_team_text}\n😞 **Losers** {losing_team_text}'
+    return name, value
 
-    return embeds
 
+def format_next_game_field(game: dict) -> Tuple[str, str]:
+    name = f"🏀 {game['home_team_abbreviation']} vs {game['away_team_abbreviation']} 🏀"
+    return name, f'{game["date"].strftime("%d %b %Y")} {game["status"]}'
 
-def format_next_game_message(game: dict) -> discord.Embed:
+
+def format_live_game_message(game: dict) -> discord.Embed:
     embeds = discord.Embed(title=f"🏀 {game['home_team_abbreviation']} vs {game['away_team_abbreviation']} 🏀")
-    embeds.add_field(name=f"Match Date", value=f'{game["date"].strftime("%d %b %Y")} {game["status"]}', inline=False)
+    embeds.add_field(name="Score", value=f"{game['home_team_abbreviation']} {game['home_score']} - "
+                                         f"{game['away_score']} {game['away_team_abbreviation']}", inline=False)
+    embeds.add_field(name="Status", value=game["status"], inline=False)
+    return embeds
+
+
+def format_standings_message(ranking: list) -> discord.Embed:
+    embeds = discord.Embed(title=f"🏀 NBA Standings 🏀")
+    lines = [f"`{idx:>2}. {record.team} {record.wins:>2}-{record.losses:<2} {record.streak_text:>3}`"
+             for idx, record in enumerate(ranking, start=1)]
+    if not lines:
+        lines = ["No games played yet"]
+    # Field values are limited to 1024 characters, split the table into halves
+    half = (len(lines) + 1) // 2
+    embeds.add_field(name="Team W-L Streak", value="\n".join(lines[:half]), inline=True)
+    if lines[half:]:
+        embeds.add_field(name="\u200b", value="\n".join(lines[half:]), inline=True)
+    return embeds
+
+
+def format_team_message(record: TeamRecord) -> discord.Embed:
+    embeds = discord.Embed(title=f"🏀 {record.team} 🏀")
+    embeds.add_field(name="Record", value=f"{record.wins}-{record.losses} ({record.win_percentage:.3f})", inline=False)
+    embeds.add_field(name="Home", value=f"{record.home_wins}-{record.home_losses}", inline=True)
+    embeds.add_field(name="Away", value=f"{record.away_wins}-{record.away_losses}", inline=True)
+    embeds.add_field(name="Last 10", value=record.last_10_text, inline=True)
+    embeds.add_field(name="Streak", value=record.streak_text, inline=True)
+    embeds.add_field(name="Point Differential", value=f"{record.point_differential:+d}", inline=True)
     return embeds
 
 
@@ -90,6 +131,8 @@ def format_help_message() -> discord.Embed:
     embeds = discord.Embed(title=f"🏀 nba-bot Helpdesk 🏀")
     embeds.add_field(name=f"!lastscores", value=f'Shows you the final scores of the most recent NBA games', inline=False)
     embeds.add_field(name=f"!upcoming", value=f'Shows you upcoming NBA games', inline=False)
+    embeds.add_field(name=f"!standings", value=f'Shows you the current league standings', inline=False)
+    embeds.add_field(name=f"!team XYZ", value=f'Shows you the record of a team eg. `!team LAL`', inline=False)
     embeds.add_field(name=f"Custom ranges", value=f'Add a number to the end of the above commands to get a custom range '
                                                   f'eg. `!upcoming5` will show the next 5 games', inline=False)
     embeds.set_footer(text=f'nba-bot, created by Dinesh#7505')
@@ -148,15 +191,60 @@ async def today_games_daily():
     try:
         message_channel = client.get_channel(DISCORD_CHANNEL_ID_NBA)
         logger.info(f"Sending daily message to {message_channel}")
-        await message_channel.send("Your daily NBA schedule, served with ☕")
         todays_games = get_today_games(games2021_22)
-        for game in todays_games:
-            response = format_next_game_message(game)
-            await message_channel.send(embed=response)
+        fields = [format_next_game_field(game) for game in todays_games]
+        await sender.send_fields(message_channel, "🏀 Today's NBA games 🏀", fields,
+                                 content="Your daily NBA schedule, served with ☕")
     except Exception as exc:
         logger.exception(f"Exception: {exc}")
 
 
+def record_final_score(game: dict):
+    scheduled_game = games_by_id.get(game["game_id"])
+    if scheduled_game is not None:
+        scheduled_game["home_score"] = game["home_score"]
+        scheduled_game["away_score"] = game["away_score"]
+        scheduled_game["status"] = game["status"]
+    standings.add_game(game)
+
+
+async def publish_live_scores(channel, changed_games: list):
+    # Forget posts for games that are no longer in the feed
+    for game_id in [game_id for game_id in live_posts if game_id not in live_tracker.games]:
+        del live_posts[game_id]
+
+    new_posts = []
+    for game in changed_games:
+        if game["state"] == "final":
+            record_final_score(game)
+
+        response = format_live_game_message(game)
+        if game["game_id"] in live_posts:
+            # Each game owns its message (one embed, no content), so the edit replaces nothing else
+            sender.edit(live_posts[game["game_id"]], embed=response)
+        elif game["state"] != "scheduled":
+            # Upcoming games are already covered by the daily schedule, only post once play has started
+            new_posts.append((game["game_id"], sender.send(channel, embed=response)))
+
+    for game_id, future in new_posts:
+        message = await future
+        if message is not None:
+            live_posts[game_id] = message
+
+
+@tasks.loop(seconds=60)
+async def live_scores():
+    await client.wait_until_ready()
+    try:
+        changed_games = await client.loop.run_in_executor(None, live_tracker.poll)
+        if changed_games:
+            logger.info(f"Pushing {len(changed_games)} live score updates")
+            await publish_live_scores(client.get_channel(DISCORD_CHANNEL_ID_NBA), changed_games)
+    except Exception as exc:
+        logger.exception(f"Exception: {exc}")
+    live_scores.change_interval(seconds=live_tracker.next_interval())
+
+
 @client.event
 async def on_message(message):
     global games2021_22
@@ -169,14 +257,13 @@ async def on_message(message):
         return
 
     content = str(message.content).lower()
-    logger.info(f"Message={message}")
+    message_logger.info(f"MessageId={message.id}, Author={message.author}, Content={content}")
     if content.startswith("!lastscores".lower()):
         try:
             limit = get_number_from_str(content, default=5)
             last_games = get_last_games(games2021_22, limit)
-            for game in last_games:
-                response = format_last_game_message(game)
-                await message.channel.send(embed=response)
+            fields = [format_last_game_field(game) for game in last_games]
+            await sender.send_fields(message.channel, "🏀 Last NBA scores 🏀", fields)
             logger.info(f"Successfully sent lastscores")
         except Exception as exc:
             logger.exception(f"Exception: {exc}")
@@ -184,27 +271,38 @@ async def on_message(message):
         try:
             limit = get_number_from_str(content, default=10)
             next_games = get_next_games(games2021_22, limit)
-            for game in next_games:
-                response = format_next_game_message(game)
-                await message.channel.send(embed=response)
+            fields = [format_next_game_field(game) for game in next_games]
+            await sender.send_fields(message.channel, "🏀 Upcoming NBA games 🏀", fields)
             logger.info(f"Successfully sent upcoming")
         except Exception as exc:
             logger.exception(f"Exception: {exc}")
+    elif content.startswith("!standings"):
+        response = format_standings_message(standings.get_ranking())
+        await sender.send(message.channel, embed=response)
+        logger.info(f"Successfully sent standings")
+    elif content.startswith("!team"):
+        team = content[len("!team"):].strip()
+        record = standings.get_team(team)
+        if record is None:
+            await sender.send(message.channel, f"No record found for team `{team.upper()}`")
+        else:
+            await sender.send(message.channel, embed=format_team_message(record))
+        logger.info(f"Successfully sent team {team}")
     elif content.startswith("!nbahelp".lower()):
         response = format_help_message()
-        await message.channel.send(embed=response)
+        await sender.send(message.channel, embed=response)
         logger.info(f"Successfully sent help")
     else:
-        logger.debug(f"Invalid message {message}")
+        message_logger.debug(f"Invalid message {message.id}")
 
 
 @client.event
 async def on_error(event, *args, **kwargs):
-    with open('err.log', 'a') as f:
-        if event == 'on_message':
-            f.write(f'Unhandled message: {args[0]}\n')
-        else:
-            raise
+    if event == 'on_message':
+        error_logger.error(f'Unhandled message: {args[0]}')
+    else:
+        raise
 
 today_games_daily.start()
+live_scores.start()
 client.run(DISCORD_TOKEN_NBABOT)
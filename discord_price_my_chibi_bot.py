@@ -26,23 +26,25 @@ SOFTWARE.
 import logging
 import operator
 import os
+import re
 from urllib import parse
 
 import discord
 import numpy as np
 
 from config import DISCORD_TOKEN_PMCBOT, DISCORD_CHANNEL_ID_PMC, DISCORD_GUILD_NAME_PMC, CONTRACT_ADDRESS
+from src.discord_sender import DiscordSender
+from src.log_setup import ERROR_LOGGER_NAME, setup_logging
 from src.nft_analytics import NFTAnalytics
+from src.portfolio import fetch_wallet_assets, summarize_portfolio, value_assets
+from src.price_model import HedonicPriceModel
+from src.trait_index import TraitBitmapIndex, TraitMatrix, parse_filter_query
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("logfile_pmcbot.log", mode="a"),
-        logging.StreamHandler()
-    ]
-)
+setup_logging("logfile_pmcbot.log", error_filename="err2.log", sample_rates={f"{__name__}.messages": 10})
 logger = logging.getLogger(__name__)
+# Per message logging is noisy, it is sampled by the logging setup
+message_logger = logging.getLogger(f"{__name__}.messages")
+error_logger = logging.getLogger(ERROR_LOGGER_NAME)
 
 cbd = NFTAnalytics(CONTRACT_ADDRESS)
 DATA_FOLDER = os.path.join("data")
@@ -53,9 +55,22 @@ asset_data = cbd.load_json(filename=database_path)
 iqs = cbd.extract_asset_type_from_traits(asset_data, trait_type_to_extract="IQ")
 iq_percentiles = cbd.get_percentile_score(iqs)
 asset_data = cbd.remove_asset_type_from_traits(asset_data, trait_type_to_remove="IQ")
+trait_matrix = TraitMatrix(asset_data)
+trait_bitmaps = TraitBitmapIndex(asset_data, iqs)
+total_traits_count, rarities = cbd.get_total_unique_trait_count_and_rarities(asset_data)
+trait_median_prices = cbd.get_trait_median_price_table(asset_data)
+
+# Optional regression based appraisal, refitted in the background on every database update. Set to True to add the
+# model estimate to the appraisal embed.
+USE_PRICE_MODEL = False
+price_model = HedonicPriceModel()
+# Bumped for every refit, so that a slower, older fit never replaces a newer model
+price_model_generation = 0
+price_model_task = None
 
 last_mtime = os.path.getmtime(database_path)
 client = discord.Client()
+sender = DiscordSender()
 
 
 def get_asset_id_from_url(url: str) -> str:
@@ -78,7 +93,7 @@ def _format_mvt(most_valuable_trait: str) -> str:
     return most_valuable_trait
 
 
-def format_message(trait_prices: dict, asset: dict, user_name: str) -> discord.Embed:
+def format_message(trait_prices: dict, asset: dict, user_name: str, appraisal: dict = None) -> discord.Embed:
     prices = np.array(list(trait_prices.values()))
 
     prices_min = []
@@ -87,12 +102,17 @@ def format_message(trait_prices: dict, asset: dict, user_name: str) -> discord.E
             prices_min.append(price)
     prices_min = np.array(prices_min)
 
-    most_valuable_trait = _format_mvt(max(trait_prices.items(), key=operator.itemgetter(1))[0])
+    if appraisal and appraisal["contributions"]:
+        most_valuable_trait = _format_mvt(next(iter(appraisal["contributions"])))
+    else:
+        most_valuable_trait = _format_mvt(max(trait_prices.items(), key=operator.itemgetter(1))[0])
 
     embeds = discord.Embed(title=f"🤑 {asset['name']} for {user_name} 🤑", url=asset["permalink"])
     embeds.add_field(name="**Average Price** 💸", value=f"{np.nanmean(prices):.2f} ETH", inline=False)
     embeds.add_field(name="**Min Price**", value=f"{np.nanmin(prices_min):.2f} ETH", inline=True)
     embeds.add_field(name="**Max Price**", value=f"{np.nanmax(prices):.2f} ETH", inline=True)
+    if appraisal:
+        embeds.add_field(name="**Model Estimate** 🧮", value=f"{appraisal['price']:.2f} ETH", inline=False)
     embeds.add_field(name="**Most Valuable Trait** 🚀", value=f'{most_valuable_trait}', inline=False)
     embeds.add_field(name="**IQ Ranking** 🤯", value=f'{asset["IQ"]} IQ, {asset["IQ_percentile"]}% of Dinos are below '
                                           f'{asset["IQ"]} IQ', inline=False)
@@ -103,8 +123,89 @@ def format_message(trait_prices: dict, asset: dict, user_name: str) -> discord.E
     return embeds
 
 
+def format_similar_message(asset: dict, neighbors: list, user_name: str) -> discord.Embed:
+    embeds = discord.Embed(title=f"🦕 Dinos similar to {asset['name']} for {user_name} 🦕", url=asset["permalink"])
+    for token_id, score in neighbors:
+        neighbor = asset_data[trait_matrix.positions[token_id]]
+        price = trait_matrix.get_price(token_id)
+        price_text = f"{price:.2f} ETH" if price is not None else "Not listed"
+        embeds.add_field(name=f"**{neighbor['name']}**",
+                         value=f"[{score:.0%} similar, {price_text}]({neighbor['permalink']})", inline=False)
+
+    embeds.set_thumbnail(url=asset["image_url"])
+    embeds.set_footer(text=f'Dino Appraisal Bot, created by Dinesh#7505\nSimilarity is based on shared traits.')
+    return embeds
+
+
+def format_find_message(token_ids: list, query: str, user_name: str) -> discord.Embed:
+    embeds = discord.Embed(title=f"🔎 Listed Dinos matching `{query[:150]}` for {user_name} 🔎")
+    if not token_ids:
+        embeds.description = "No listed Dinos match your filter"
+    for token_id in token_ids:
+        asset = asset_data[trait_matrix.positions[token_id]]
+        embeds.add_field(name=f"**{asset['name']}**",
+                         value=f"[{trait_matrix.get_price(token_id):.2f} ETH, {iqs.get(token_id, '?')} IQ]"
+                               f"({asset['permalink']})", inline=False)
+
+    embeds.set_footer(text=f'Dino Appraisal Bot, created by Dinesh#7505\nFilter with eg. '
+                           f'`!find hat=cowboy hat|beanie, eyes!=laser, price<0.5, iq>=120, sort=-iq`')
+    return embeds
+
+
+def format_portfolio_message(address: str, summary: dict, user_name: str, valued_by_model: bool) -> discord.Embed:
+    embeds = discord.Embed(title=f"💼 Portfolio of {address[:6]}...{address[-4:]} for {user_name} 💼",
+                           url=f"https://opensea.io/{address}")
+    # Some assets may not have been fetched, e.g. when OpenSea throttles us
+    incomplete = summary["count"] < summary["owned"]
+    held = f"{summary['count']} of {summary['owned']}" if incomplete else f"{summary['count']}"
+    embeds.add_field(name="**Dinos Held** 🦕", value=held, inline=True)
+    embeds.add_field(name="**Total Value** 💸", value=f"{summary['total_value']:.2f} ETH", inline=True)
+
+    best_asset = summary["best_asset"]
+    if best_asset is not None:
+        embeds.add_field(name="**Best Dino** 🚀",
+                         value=f"[{best_asset['name']}]({best_asset['permalink']}), {summary['best_value']:.2f} ETH",
+                         inline=False)
+        embeds.set_thumbnail(url=best_asset["image_url"])
+    if summary["rarity_median"] is not None:
+        embeds.add_field(name="**Rarity Spread** 💎", value=f"{summary['rarity_min']} / {summary['rarity_median']} / "
+                                                            f"{summary['rarity_max']} (min / median / max)",
+                         inline=False)
+
+    method = "hedonic price model" if valued_by_model else "median trait listing prices"
+    embeds.set_footer(text=f'Dino Appraisal Bot, created by Dinesh#7505\nDisclaimer: No guarantees on prices. '
+                           f'{summary["valued_count"]} Dinos valued with the {method}.'
+                           f'{" Some Dinos could not be fetched, totals are incomplete." if incomplete else ""}')
+    return embeds
+
+
+async def refit_price_model():
+    global price_model, price_model_generation
+    price_model_generation += 1
+    generation = price_model_generation
+    try:
+        # Fitting runs in a worker thread, the previous model keeps answering until the new one is ready
+        model = HedonicPriceModel()
+        await client.loop.run_in_executor(None, model.fit, trait_matrix, asset_data)
+        if generation != price_model_generation:
+            logger.info(f"Discarding price model {generation}, a newer fit has been started")
+            return
+        price_model = model
+    except Exception as exc:
+        logger.exception(f"Exception: {exc}")
+
+
+def schedule_price_model_refit():
+    global price_model_task
+    price_model_task = client.loop.create_task(refit_price_model())
+
+
 @client.event
 async def on_ready():
+    # on_ready fires again on reconnect, do not start another fit while one is running
+    if USE_PRICE_MODEL and not price_model.is_fitted and (price_model_task is None or price_model_task.done()):
+        schedule_price_model_refit()
+
     for guild in client.guilds:
         if guild.name == DISCORD_GUILD_NAME_PMC:
             logger.info(f'{client.user.name} has connected to {guild.name} (id: {guild.id})!')
@@ -113,7 +214,8 @@ async def on_ready():
 
 @client.event
 async def on_message(message):
-    global asset_data, last_mtime, database_path, iqs, iq_percentiles
+    global asset_data, last_mtime, database_path, iqs, iq_percentiles, trait_matrix, trait_bitmaps, \
+        total_traits_count, rarities, trait_median_prices
     if message.author == client.user:
         return
 
@@ -130,7 +232,13 @@ async def on_message(message):
         iqs = cbd.extract_asset_type_from_traits(asset_data, trait_type_to_extract="IQ")
         iq_percentiles = cbd.get_percentile_score(iqs)
         asset_data = cbd.remove_asset_type_from_traits(asset_data, trait_type_to_remove="IQ")
+        trait_matrix = TraitMatrix(asset_data)
+        trait_bitmaps = TraitBitmapIndex(asset_data, iqs)
+        total_traits_count, rarities = cbd.get_total_unique_trait_count_and_rarities(asset_data)
+        trait_median_prices = cbd.get_trait_median_price_table(asset_data)
         last_mtime = current_mtime
+        if USE_PRICE_MODEL:
+            schedule_price_model_refit()
 
     if content.startswith(f"https://opensea.io/assets/{CONTRACT_ADDRESS}/".lower()):
         try:
@@ -141,7 +249,7 @@ async def on_message(message):
             # Parse the URL to generate an asset ID
             asset_id = get_asset_id_from_url(content)
 
-            logger.info(f"AssetId={asset_id}, Content={content}, Message={message}")
+            logger.info(f"AssetId={asset_id}, Content={content}, MessageId={message.id}, Author={message.author}")
 
             # single_asset = gaa.get_single_asset(asset_id)
 
@@ -154,8 +262,12 @@ async def on_message(message):
             if not single_asset:
                 raise ValueError(f"Asset id {asset_id} not found in database")
 
-            await message.channel.send(
-                f"Crunching through 10k data points, just for you {message.author.name} 😉. Hold tight!")
+            # Status messages are merged or dropped by the sender when the channel is busy. Wait for it to go out
+            # before the blocking appraisal below.
+            await sender.send(message.channel,
+                              f"Crunching through 10k data points, just for you {message.author.name} 😉. "
+                              f"Hold tight!",
+                              status=True)
 
             # Get median trait prices of single asset
             prices = cbd.get_traits_with_median_prices(asset_data, single_asset)
@@ -164,21 +276,73 @@ async def on_message(message):
             single_asset["IQ_percentile"] = iq_percentiles[asset_id]
 
             # Format response to Discord bot
-            response = format_message(prices, single_asset, message.author.name)
-            await message.channel.send(embed=response)
+            appraisal = None
+            if USE_PRICE_MODEL and price_model.is_fitted and asset_id in price_model.trait_matrix.positions:
+                appraisal = price_model.appraise(asset_id)
+
+            response = format_message(prices, single_asset, message.author.name, appraisal)
+            await sender.send(message.channel, embed=response)
+        except Exception as exc:
+            logger.error(f"Exception: {exc}")
+    elif content.startswith("!similar"):
+        try:
+            # Accept either a full OpenSea URL or a bare token id
+            asset_id = get_asset_id_from_url(content[len("!similar"):].strip().rstrip("/"))
+            logger.info(f"Similar AssetId={asset_id}, MessageId={message.id}, Author={message.author}")
+
+            if asset_id not in trait_matrix.positions:
+                raise ValueError(f"Asset id {asset_id} not found in database")
+
+            neighbors = trait_matrix.most_similar(asset_id, k=5)
+            single_asset = asset_data[trait_matrix.positions[asset_id]]
+            response = format_similar_message(single_asset, neighbors, message.author.name)
+            await sender.send(message.channel, embed=response)
+        except Exception as exc:
+            logger.error(f"Exception: {exc}")
+    elif content.startswith("!find"):
+        try:
+            query = content[len("!find"):].strip()
+            logger.info(f"Find Query={query}, MessageId={message.id}, Author={message.author}")
+
+            token_ids = trait_bitmaps.query(**parse_filter_query(query), listed_only=True, limit=10)
+            response = format_find_message(token_ids, query, message.author.name)
+            await sender.send(message.channel, embed=response)
+        except Exception as exc:
+            logger.error(f"Exception: {exc}")
+    elif content.startswith("!portfolio"):
+        try:
+            address = content[len("!portfolio"):].strip()
+            if not re.fullmatch(r"0x[0-9a-f]{40}", address):
+                raise ValueError(f"Invalid wallet address {address}")
+            logger.info(f"Portfolio Address={address}, MessageId={message.id}, Author={message.author}")
+
+            await sender.send(message.channel,
+                              f"Looking through the wallet, just for you {message.author.name} 😉. Hold tight!",
+                              status=True)
+
+            known_assets = {token_id: asset_data[position] for token_id, position in trait_matrix.positions.items()}
+            holdings, owned = await fetch_wallet_assets(cbd, address, known_assets)
+            holdings = cbd.remove_asset_type_from_traits(holdings, trait_type_to_remove="IQ")
+
+            valued_by_model = USE_PRICE_MODEL and price_model.is_fitted
+            values = value_assets(holdings, price_model if valued_by_model else None, trait_median_prices)
+            rarity_scores = [cbd.get_rarity_score(asset, rarities, total_traits_count) for asset in holdings]
+
+            summary = summarize_portfolio(holdings, values, rarity_scores, owned)
+            response = format_portfolio_message(address, summary, message.author.name, valued_by_model)
+            await sender.send(message.channel, embed=response)
         except Exception as exc:
             logger.error(f"Exception: {exc}")
     else:
-        logger.warning(f"Invalid url {message}")
+        message_logger.info(f"Invalid url in message {message.id}, Content={content}")
 
 
 @client.event
 async def on_error(event, *args, **kwargs):
-    with open('err2.log', 'a') as f:
-        if event == 'on_message':
-            f.write(f'Unhandled message: {args[0]}\n')
-        else:
-            raise
+    if event == 'on_message':
+        error_logger.error(f'Unhandled message: {args[0]}')
+    else:
+        raise
 
 
 client.run(DISCORD_TOKEN_PMCBOT)
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Hard limits imposed by Discord on a single message and embed
+MAX_CONTENT_LENGTH = 2000
+MAX_FIELDS_PER_EMBED = 25
+MAX_EMBED_CHARACTERS = 6000
+
+
+def pack_fields(title: str, fields: List[Tuple[str, str]], inline: bool = False) -> List[discord.Embed]:
+    """
+    Pack (name, value) fields into as few embeds as possible. discord.py 1.x sends a single embed per message, so
+    listing items as fields of one embed instead of one embed each saves up to 25 sends.
+    """
+    embeds = []
+    embed, size = None, 0
+    for name, value in fields:
+        field_size = len(name) + len(value)
+        if embed is None or len(embed.fields) >= MAX_FIELDS_PER_EMBED or size + field_size > MAX_EMBED_CHARACTERS:
+            embed = discord.Embed(title=title if not embeds else f"{title} (cont.)")
+            size = len(embed.title)
+            embeds.append(embed)
+        embed.add_field(name=name, value=value, inline=inline)
+        size += field_size
+    return embeds
+
+
+class RateLimitBucket:
+    """Token bucket mirroring Discord's per-channel message rate limit (5 messages per 5 seconds)."""
+
+    def __init__(self, capacity: int = 5, period: float = 5.0):
+        self.capacity = capacity
+        self.period = period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.capacity / self.period)
+        self._updated = now
+
+    def delay(self) -> float:
+        self._refill()
+        wait = max(0.0, self._blocked_until - time.monotonic())
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) * self.period / self.capacity)
+        return wait
+
+    async def acquire(self):
+        wait = self.delay()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.delay()
+        self._tokens -= 1
+
+    def defer(self, retry_after: float):
+        # Called after a 429, the bucket is exhausted until Discord says otherwise
+        self._tokens = 0.0
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+
+class _PendingMessage:
+    __slots__ = ("content", "embed", "status", "future", "target")
+
+    def __init__(self, content: Optional[str], embed: Optional[discord.Embed], status: bool, future: asyncio.Future,
+                 target: Optional[discord.Message] = None):
+        self.content = content
+        self.embed = embed
+        self.status = status
+        self.future = future
+        # Message to edit in place instead of sending a new one
+        self.target = target
+
+
+class DiscordSender:
+    """
+    Queues outbound messages per channel and paces sends so that the channel rate limit is respected. Written
+    against discord.py 1.x, which allows a single embed per message, use send_fields to list several items in one
+    message.
+    """
+
+    def __init__(self, max_retries: int = 5, status_drop_threshold: int = 20):
+        self.max_retries = max_retries
+        self.status_drop_threshold = status_drop_threshold
+        self._queues: Dict[int, Deque[_PendingMessage]] = {}
+        self._buckets: Dict[int, RateLimitBucket] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def send(self, channel: discord.abc.Messageable, content: Optional[str] = None,
+             embed: Optional[discord.Embed] = None, status: bool = False) -> asyncio.Future:
+        """
+        Enqueue a message and return a future resolving to the sent discord.Message (None if the message was
+        dropped or could not be delivered). Status messages are merged with each other and dropped under load.
+        """
+        loop = asyncio.get_event_loop()
+        queue = self._queues.setdefault(channel.id, deque())
+        future = loop.create_future()
+
+        # Discord rejects messages without content or embeds
+        if not content and embed is None:
+            future.set_result(None)
+            return future
+
+        if status and embed is None:
+            if len(queue) >= self.status_drop_threshold:
+                logger.info(f"Dropping status message for channel {channel.id}, {len(queue)} messages pending")
+                future.set_result(None)
+                return future
+            if self._merge_status(queue, content, future):
+                return future
+
+        queue.append(_PendingMessage(content, embed, status, future))
+        self._ensure_worker(channel)
+        return future
+
+    def send_fields(self, channel: discord.abc.Messageable, title: str, fields: List[Tuple[str, str]],
+                    content: Optional[str] = None, inline: bool = False) -> asyncio.Future:
+        """
+        Send a list of (name, value) fields packed into as few embeds, and therefore messages, as possible. The
+        content is attached to the first message, the future resolves to the last one.
+        """
+        embeds = pack_fields(title, fields, inline)
+        if not embeds:
+            return self.send(channel, content)
+
+        future = None
+        for idx, embed in enumerate(embeds):
+            future = self.send(channel, content if idx == 0 else None, embed=embed)
+        return future
+
+    def edit(self, message: discord.Message, content: Optional[str] = None,
+             embed: Optional[discord.Embed] = None) -> asyncio.Future:
+        """
+        Enqueue an edit of an already sent message, the content is left as is unless given. A pending edit of the
+        same message is replaced, so only the latest state is ever pushed.
+        """
+        loop = asyncio.get_event_loop()
+        queue = self._queues.setdefault(message.channel.id, deque())
+        future = loop.create_future()
+
+        for pending in queue:
+            if pending.target is not None and pending.target.id == message.id:
+                pending.content = content
+                pending.embed = embed
+                self._chain_future(pending, future)
+                return future
+
+        queue.append(_PendingMessage(content, embed, False, future, target=message))
+        self._ensure_worker(message.channel)
+        return future
+
+    def _ensure_worker(self, channel: discord.abc.Messageable):
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.get_event_loop().create_task(self._drain(channel))
+
+    @staticmethod
+    def _chain_future(pending: _PendingMessage, future: asyncio.Future):
+        # Both callers are notified once the merged message has gone out
+        previous_future = pending.future
+        pending.future = future
+        future.add_done_callback(
+            lambda f: previous_future.done() or previous_future.set_result(None if f.cancelled() else f.result()))
+
+    def _merge_status(self, queue: Deque[_PendingMessage], content: Optional[str], future: asyncio.Future) -> bool:
+        if not queue or not queue[-1].status or queue[-1].embed is not None:
+            return False
+
+        pending = queue[-1]
+        if content and content not in (pending.content or ""):
+            merged = f"{pending.content}\n{content}" if pending.content else content
+            if len(merged) > MAX_CONTENT_LENGTH:
+                return False
+            pending.content = merged
+
+        self._chain_future(pending, future)
+        return True
+
+    async def _drain(self, channel: discord.abc.Messageable):
+        queue = self._queues[channel.id]
+        bucket = self._buckets.setdefault(channel.id, RateLimitBucket())
+        try:
+            while queue:
+                pending = queue.popleft()
+                try:
+                    message = await self._send_with_retry(channel, bucket, pending)
+                except Exception as exc:
+                    # A single bad message must not take the worker, and everything queued behind it, down
+                    logger.exception(f"Failed to send message to channel {channel.id}: {exc}")
+                    message = None
+                if not pending.future.done():
+                    pending.future.set_result(message)
+        finally:
+            self._workers.pop(channel.id, None)
+
+    async def _send_with_retry(self, channel: discord.abc.Messageable, bucket: RateLimitBucket,
+                               pending: _PendingMessage) -> Optional[discord.Message]:
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                if pending.target is not None:
+                    # Only touch the content when a new one is given, discord.py 1.x edits the message in place and
+                    # returns None
+                    kwargs = {"embed": pending.embed}
+                    if pending.content is not None:
+                        kwargs["content"] = pending.content
+                    await pending.target.edit(**kwargs)
+                    return pending.target
+                return await channel.send(content=pending.content, embed=pending.embed)
+            except discord.HTTPException as exc:
+                if exc.status == 429:
+                    retry_after = float(exc.response.headers.get("Retry-After", 1.0))
+                    logger.warning(f"Rate limited on channel {channel.id}, retrying in {retry_after:.2f}s")
+                    bucket.defer(retry_after)
+                elif exc.status >= 500:
+                    backoff = 2 ** attempt
+                    logger.warning(f"Discord error {exc.status} on channel {channel.id}, retrying in {backoff}s")
+                    bucket.defer(backoff)
+                else:
+                    logger.error(f"Failed to send message to channel {channel.id}: {exc}")
+                    return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                backoff = 2 ** attempt
+                logger.warning(f"Connection error on channel {channel.id}: {exc}, retrying in {backoff}s")
+                bucket.defer(backoff)
+        logger.error(f"Giving up on message to channel {channel.id} after {self.max_retries} retries")
+        return None
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Records sent to this logger are additionally written to the error file
+ERROR_LOGGER_NAME = "unhandled"
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "name": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only every n-th record below WARNING for each of the given logger names (and their children)."""
+
+    def __init__(self, sample_rates: Dict[str, int]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self._counters = {name: 0 for name in sample_rates}
+        # Records also arrive from executor threads
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.sample_rates.items():
+            if record.name == name or record.name.startswith(name + "."):
+                with self._lock:
+                    self._counters[name] += 1
+                    count = self._counters[name]
+                return rate <= 1 or count % rate == 1
+        return True
+
+
+class _LoggerNameFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.name == self.name
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = False
+
+    def start(self):
+        super().start()
+        self.running = True
+
+    def stop(self):
+        # Safe to call more than once, e.g. explicitly and again at exit
+        if self.running:
+            self.running = False
+            super().stop()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args and render tracebacks on the caller side, but leave the final formatting to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(filename: str, error_filename: Optional[str] = None, level: int = logging.INFO,
+                  json_format: bool = False, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  sample_rates: Optional[Dict[str, int]] = None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue, so that callers (e.g. the asyncio loop) never block on disk I/O. The
+    file and stream handlers run on a separate listener thread.
+    """
+    formatter = JSONFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(filename, mode="a", maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding="utf-8")
+    stream_handler = logging.StreamHandler()
+    handlers = [file_handler, stream_handler]
+
+    if error_filename is not None:
+        error_handler = logging.handlers.RotatingFileHandler(error_filename, mode="a", maxBytes=max_bytes,
+                                                             backupCount=backup_count, encoding="utf-8")
+        error_handler.addFilter(_LoggerNameFilter(ERROR_LOGGER_NAME))
+        handlers.append(error_handler)
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = _QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued on shutdown
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import abc
+import datetime
+import json
+import logging
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Fields which, when changed, warrant a new push to Discord
+TRACKED_FIELDS = ("home_score", "away_score", "period", "state")
+
+
+def _parse_start_time(value: str) -> datetime.datetime:
+    # Times are kept as naive UTC, e.g. "2021-10-19T23:30:00Z"
+    return datetime.datetime.strptime(value.rstrip("Z"), "%Y-%m-%dT%H:%M:%S")
+
+
+class ScoreSource(abc.ABC):
+    """Base class for anything that can produce a snapshot of today's games."""
+
+    @abc.abstractmethod
+    def fetch(self) -> List[dict]:
+        pass
+
+
+class NBALiveScoreSource(ScoreSource):
+    STATES = {1: "scheduled", 2: "live", 3: "final"}
+
+    def __init__(self, url: str = "https://cdn.nba.com/static/json/liveData/scoreboard/todaysScoreboard_00.json",
+                 timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> List[dict]:
+        response = requests.request("GET", self.url, headers={"Accept": "application/json"}, timeout=self.timeout)
+        scoreboard = json.loads(response.text)["scoreboard"]
+
+        games = []
+        for game in scoreboard["games"]:
+            games.append({
+                "game_id": game["gameId"],
+                "home_team_abbreviation": game["homeTeam"]["teamTricode"],
+                "away_team_abbreviation": game["awayTeam"]["teamTricode"],
+                "home_score": int(game["homeTeam"]["score"]),
+                "away_score": int(game["awayTeam"]["score"]),
+                "period": int(game["period"]),
+                "status": game["gameStatusText"].strip(),
+                "state": self.STATES.get(game["gameStatus"], "scheduled"),
+                "start_time": _parse_start_time(game["gameTimeUTC"]),
+            })
+        return games
+
+
+class RecordedFeedScoreSource(ScoreSource):
+    """Replays a recorded feed, a JSON list of snapshots in the normalised format, one snapshot per fetch."""
+
+    def __init__(self, filename: str):
+        with open(filename) as f:
+            self.snapshots = json.load(f)
+        self.idx = 0
+
+    def fetch(self) -> List[dict]:
+        # Once the recording is exhausted the last snapshot is repeated
+        snapshot = self.snapshots[min(self.idx, len(self.snapshots) - 1)]
+        self.idx += 1
+
+        games = []
+        for game in snapshot:
+            game = dict(game)
+            game["start_time"] = _parse_start_time(game["start_time"])
+            games.append(game)
+        return games
+
+
+class LiveScoreTracker:
+    def __init__(self, source: ScoreSource, live_interval: float = 20, idle_interval: float = 900,
+                 pregame_window: datetime.timedelta = datetime.timedelta(minutes=15)):
+        self.source = source
+        self.live_interval = live_interval
+        self.idle_interval = idle_interval
+        self.pregame_window = pregame_window
+        self.games: Dict[str, dict] = {}
+        self.seeded = False
+
+    def poll(self) -> List[dict]:
+        """
+        Fetch a snapshot from the source and return only the games whose score or status changed. The first poll only
+        seeds the state and reports nothing, so that a restart does not re-post games which were already covered.
+        """
+        changed = []
+        games = {}
+        for game in self.source.fetch():
+            previous = self.games.get(game["game_id"])
+            if previous is None or any(previous[field] != game[field] for field in TRACKED_FIELDS):
+                changed.append(game)
+            games[game["game_id"]] = game
+
+        # Games from previous days drop out of the feed and are forgotten
+        self.games = games
+        if not self.seeded:
+            self.seeded = True
+            return []
+        return changed
+
+    def next_interval(self, now: Optional[datetime.datetime] = None) -> float:
+        if now is None:
+            now = datetime.datetime.utcnow()
+
+        interval = self.idle_interval
+        for game in self.games.values():
+            if game["state"] == "live":
+                return self.live_interval
+            if game["state"] == "scheduled":
+                until_window = (game["start_time"] - self.pregame_window - now).total_seconds()
+                if until_window <= 0:
+                    return self.live_interval
+                interval = min(interval, until_window)
+        return max(interval, self.live_interval)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+def is_final(game: dict) -> bool:
+    return str(game.get("status", "")).startswith("Final")
+
+
+class TeamRecord:
+    __slots__ = ("team", "wins", "losses", "home_wins", "home_losses", "away_wins", "away_losses",
+                 "points_for", "points_against", "streak", "last_10")
+
+    def __init__(self, team: str):
+        self.team = team
+        self.wins = 0
+        self.losses = 0
+        self.home_wins = 0
+        self.home_losses = 0
+        self.away_wins = 0
+        self.away_losses = 0
+        self.points_for = 0
+        self.points_against = 0
+        # Positive for a winning streak, negative for a losing streak
+        self.streak = 0
+        self.last_10: Deque[bool] = deque(maxlen=10)
+
+    @property
+    def games_played(self) -> int:
+        return self.wins + self.losses
+
+    @property
+    def win_percentage(self) -> float:
+        return self.wins / self.games_played if self.games_played else 0.0
+
+    @property
+    def point_differential(self) -> int:
+        return self.points_for - self.points_against
+
+    @property
+    def streak_text(self) -> str:
+        if self.streak == 0:
+            return "-"
+        return f"W{self.streak}" if self.streak > 0 else f"L{-self.streak}"
+
+    @property
+    def last_10_text(self) -> str:
+        wins = sum(self.last_10)
+        return f"{wins}-{len(self.last_10) - wins}"
+
+    def add_result(self, home: bool, points_for: int, points_against: int):
+        won = points_for > points_against
+        if won:
+            self.wins += 1
+            if home:
+                self.home_wins += 1
+            else:
+                self.away_wins += 1
+            self.streak = self.streak + 1 if self.streak > 0 else 1
+        else:
+            self.losses += 1
+            if home:
+                self.home_losses += 1
+            else:
+                self.away_losses += 1
+            self.streak = self.streak - 1 if self.streak < 0 else -1
+        self.points_for += points_for
+        self.points_against += points_against
+        self.last_10.append(won)
+
+
+class Standings:
+    """Team records maintained incrementally, one final score at a time."""
+
+    def __init__(self):
+        self.teams: Dict[str, TeamRecord] = {}
+        self._counted_game_ids = set()
+        self._ranking: Optional[List[TeamRecord]] = None
+
+    def add_game(self, game: dict) -> bool:
+        # Games can be reported by both the schedule and the live feed, only count them once
+        if not is_final(game) or game["game_id"] in self._counted_game_ids:
+            return False
+        self._counted_game_ids.add(game["game_id"])
+
+        home_score, away_score = int(game["home_score"]), int(game["away_score"])
+        self._get_team(game["home_team_abbreviation"]).add_result(True, home_score, away_score)
+        self._get_team(game["away_team_abbreviation"]).add_result(False, away_score, home_score)
+        self._ranking = None
+        return True
+
+    def add_games(self, games: list):
+        for game in sorted((game for game in games if is_final(game)), key=lambda g: g["date"]):
+            self.add_game(game)
+
+    def get_team(self, team: str) -> Optional[TeamRecord]:
+        return self.teams.get(team.upper())
+
+    def get_ranking(self) -> List[TeamRecord]:
+        # The ordering is rebuilt at most once per batch of new results, not on every query
+        if self._ranking is None:
+            self._ranking = sorted(self.teams.values(),
+                                   key=lambda r: (r.win_percentage, r.point_differential), reverse=True)
+        return self._ranking
+
+    def _get_team(self, team: str) -> TeamRecord:
+        if team not in self.teams:
+            self.teams[team] = TeamRecord(team)
+        return self.teams[team]
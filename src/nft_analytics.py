@@ -32,16 +32,8 @@ import numpy as np
 import scipy.stats as scs
 from tqdm import tqdm
 
-from .opensea_api import OpenSeaAPI
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("logfile.log", mode="a"),
-        logging.StreamHandler()
-    ]
-)
+from .opensea_api import OpenSeaAPI, get_listing_price
+
 logger = logging.getLogger(__name__)
 
 
@@ -135,13 +127,14 @@ class NFTAnalytics(OpenSeaAPI):
 
     @staticmethod
     def get_trait_values_for_type(asset_data: list, trait_type: str) -> list:
-        trait_values = []
+        # Dict keys keep first-seen order while making the membership check O(1)
+        trait_values = {}
         for asset in asset_data:
             for traits in asset["traits"]:
-                if traits["trait_type"] == trait_type and str(traits["value"]) not in trait_values:
-                    trait_values.append(str(traits["value"]))
+                if traits["trait_type"] == trait_type:
+                    trait_values[str(traits["value"])] = None
 
-        return trait_values
+        return list(trait_values)
 
     def get_trait_type_median_price(self, asset_data: list, trait_type: str) -> dict:
         trait_value_prices = {}
@@ -151,12 +144,35 @@ class NFTAnalytics(OpenSeaAPI):
             for asset in asset_data:
                 if asset["sell_orders"]:
                     for traits in asset["traits"]:
-                        if traits["trait_type"] == trait_type and traits["value"] == value:
-                            listing_prices_trait.append(float(asset["sell_orders"][0]["base_price"]) / 1e18)
+                        # Values are compared as strings, like the keys from get_trait_values_for_type
+                        if traits["trait_type"] == trait_type and str(traits["value"]) == value:
+                            listing_prices_trait.append(get_listing_price(asset))
 
             trait_value_prices[value] = np.nanmedian(np.array(listing_prices_trait))
         return dict(sorted(trait_value_prices.items(), key=lambda item: item[1], reverse=True))
 
+    @staticmethod
+    def adjust_trait_price(trait_value: str, price: float) -> float:
+        # Numbered traits (containing "#") are heavily discounted
+        if "#" in trait_value.lower():
+            price *= 0.1
+        return price
+
+    def get_trait_median_price_table(self, asset_data: list) -> dict:
+        """
+        Median listing price of every (trait_type, value) pair in a single pass over the data, with the same
+        adjustments as get_traits_with_median_prices.
+        """
+        listing_prices = {}
+        for asset in asset_data:
+            if asset["sell_orders"]:
+                price = get_listing_price(asset)
+                for traits in asset["traits"]:
+                    listing_prices.setdefault((traits["trait_type"], str(traits["value"])), []).append(price)
+
+        return {key: self.adjust_trait_price(key[1], float(np.median(prices)))
+                for key, prices in listing_prices.items()}
+
     def get_median_prices(self, asset_data: list, traits_dict: dict) -> np.ndarray:
         median_prices = []
         for trait_type, trait_value in traits_dict.items():
@@ -173,8 +189,7 @@ class NFTAnalytics(OpenSeaAPI):
 
         for trait_type, trait_value in traits.items():
             price = self.get_trait_type_median_price(asset_data, trait_type)[trait_value]
-            if "#" in trait_value.lower():
-                price *= 0.1
+            price = self.adjust_trait_price(trait_value, price)
             trait_prices[trait_value + " " + trait_type] = price
 
         return trait_prices
@@ -182,13 +197,13 @@ class NFTAnalytics(OpenSeaAPI):
     @staticmethod
     def get_total_unique_trait_count_and_rarities(asset_data: list) -> Tuple[int, np.ndarray]:
         total_traits_count = 0
-        traits_counted = []
+        traits_counted = set()
 
         for asset in asset_data:
             if asset["traits"]:
                 for traits in asset["traits"]:
                     if traits["value"] not in traits_counted:
-                        traits_counted.append(traits["value"])
+                        traits_counted.add(traits["value"])
                         total_traits_count += traits["trait_count"]
 
         rarities = []
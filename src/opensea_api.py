@@ -25,21 +25,21 @@ SOFTWARE.
 
 import json
 import logging
+import math
 
 import requests
 from pycoingecko import CoinGeckoAPI
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[
-        logging.FileHandler("logfile.log", mode="a"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def get_listing_price(asset: dict) -> float:
+    # Current listing price in ETH, NaN for assets which are not listed
+    if asset.get("sell_orders"):
+        return float(asset["sell_orders"][0]["base_price"]) / 1e18
+    return math.nan
+
+
 class OpenSeaAPI:
     def __init__(self, asset_contract_address: str):
         self.asset_limit = 10
@@ -98,6 +98,19 @@ class OpenSeaAPI:
 
         return json.loads(response.text)
 
+    def get_owner_assets(self, owner: str, offset: int = 0, limit: int = 50) -> dict:
+        url = self.base_url + "assets"
+
+        querystring = {
+            "owner": owner,
+            "offset": str(offset),
+            "limit": str(limit),
+            "asset_contract_address": self.asset_contract_address,
+        }
+        response = requests.request("GET", url, headers={"Accept": "application/json"}, params=querystring)
+
+        return json.loads(response.text)
+
     def get_collections_data(self, address: str) -> dict:
         url = self.base_url + "collections"
 
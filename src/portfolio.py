@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .opensea_api import OpenSeaAPI
+from .price_model import HedonicPriceModel
+
+logger = logging.getLogger(__name__)
+
+# OpenSea page size for the assets endpoint
+PAGE_SIZE = 50
+
+
+def get_owned_asset_count(collections: list, asset_contract_address: str) -> int:
+    owned = 0
+    for collection in collections:
+        contracts = collection.get("primary_asset_contracts") or []
+        if any(contract["address"].lower() == asset_contract_address.lower() for contract in contracts):
+            owned += int(collection.get("owned_asset_count", 0))
+    return owned
+
+
+async def fetch_wallet_assets(api: OpenSeaAPI, address: str, known_assets: Dict[str, dict],
+                              max_concurrency: int = 5, max_attempts: int = 3) -> Tuple[List[dict], int]:
+    """
+    Return every asset of the collection held by the wallet, together with the number of assets OpenSea reports as
+    owned. Assets already in the local database are taken from there, the rest come from the OpenSea listing or, if
+    that lacks traits, an individual asset request. All HTTP requests run in worker threads with at most
+    max_concurrency in flight, failed requests (e.g. throttling) are retried with a backoff.
+    """
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(func, *args, expected_key: str):
+        for attempt in range(max_attempts):
+            try:
+                async with semaphore:
+                    result = await loop.run_in_executor(None, func, *args)
+                if isinstance(result, dict) and expected_key in result:
+                    return result
+                logger.warning(f"Unexpected response from {func.__name__}{args}: {result}")
+            except Exception as exc:
+                logger.warning(f"Request {func.__name__}{args} failed: {exc}")
+            if attempt < max_attempts - 1:
+                await asyncio.sleep(2 ** attempt)
+        return None
+
+    collections = await loop.run_in_executor(None, api.get_collections_data, address)
+    if not isinstance(collections, list):
+        raise ValueError(f"Could not fetch collections for {address}: {collections}")
+
+    owned = get_owned_asset_count(collections, api.asset_contract_address)
+    if owned == 0:
+        return [], 0
+
+    pages = await asyncio.gather(*[call(api.get_owner_assets, address, offset, PAGE_SIZE, expected_key="assets")
+                                   for offset in range(0, owned, PAGE_SIZE)])
+
+    holdings, missing = {}, []
+    for page in pages:
+        if page is None:
+            continue
+        for asset in page["assets"]:
+            token_id = asset["token_id"]
+            if token_id in known_assets:
+                holdings[token_id] = known_assets[token_id]
+            elif asset.get("traits"):
+                holdings[token_id] = asset
+            else:
+                missing.append(token_id)
+
+    for asset in await asyncio.gather(*[call(api.get_single_asset, token_id, expected_key="token_id")
+                                        for token_id in missing]):
+        if asset is not None:
+            holdings[asset["token_id"]] = asset
+
+    if len(holdings) < owned:
+        logger.warning(f"Only fetched {len(holdings)} of {owned} assets owned by {address}")
+    return list(holdings.values()), owned
+
+
+def value_assets(assets: List[dict], price_model: Optional[HedonicPriceModel] = None,
+                 median_table: Optional[dict] = None) -> np.ndarray:
+    """
+    Value all assets in one batch, with the fitted price model if available and otherwise the mean of the median
+    listing prices of their traits.
+    """
+    if price_model is not None and price_model.is_fitted:
+        return price_model.predict_assets(assets)
+
+    values = np.full(len(assets), np.nan)
+    for idx, asset in enumerate(assets):
+        prices = [median_table[(trait["trait_type"], str(trait["value"]))] for trait in asset["traits"] or []
+                  if (trait["trait_type"], str(trait["value"])) in median_table]
+        if prices:
+            values[idx] = np.mean(prices)
+    return values
+
+
+def summarize_portfolio(assets: List[dict], values: np.ndarray, rarity_scores: List[int], owned: int) -> dict:
+    summary = {
+        "count": len(assets),
+        "owned": owned,
+        "total_value": float(np.nansum(values)),
+        "valued_count": int(np.count_nonzero(~np.isnan(values))),
+        "best_asset": None,
+        "best_value": math.nan,
+        "rarity_min": None,
+        "rarity_median": None,
+        "rarity_max": None,
+    }
+    if summary["valued_count"]:
+        best = int(np.nanargmax(values))
+        summary["best_asset"] = assets[best]
+        summary["best_value"] = float(values[best])
+
+    rarity_scores = [score for score in rarity_scores if score >= 0]
+    if rarity_scores:
+        summary["rarity_min"] = int(np.min(rarity_scores))
+        summary["rarity_median"] = int(np.median(rarity_scores))
+        summary["rarity_max"] = int(np.max(rarity_scores))
+    return summary
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+import scipy.linalg as scl
+import scipy.sparse as sps
+
+from .opensea_api import get_listing_price
+from .trait_index import TraitMatrix
+
+logger = logging.getLogger(__name__)
+
+
+def get_observed_price(asset: dict) -> float:
+    # Current listing price, falling back to the last ETH sale
+    if asset.get("sell_orders"):
+        return get_listing_price(asset)
+    last_sale = asset.get("last_sale")
+    if last_sale and last_sale.get("payment_token", {}).get("symbol") in ("ETH", "WETH"):
+        return float(last_sale["total_price"]) / 1e18
+    return np.nan
+
+
+class HedonicPriceModel:
+    """Ridge regression of log price on the one-hot trait matrix, log(price) = intercept + sum of trait weights."""
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.trait_matrix: Optional[TraitMatrix] = None
+        self.intercept = 0.0
+        self.coef = np.array([])
+        self.predictions = np.array([])
+        self.labels = []
+        self.n_observations = 0
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.trait_matrix is not None
+
+    def fit(self, trait_matrix: TraitMatrix, asset_data: list) -> "HedonicPriceModel":
+        prices = np.array([get_observed_price(asset) for asset in asset_data])
+        observed = ~np.isnan(prices) & (prices > 0)
+        if not observed.any():
+            raise ValueError("No listings or sales to fit the price model on")
+
+        design = trait_matrix.matrix[observed]
+        target = np.log(prices[observed])
+        intercept = target.mean()
+
+        # Normal equations, the gram matrix is only (number of traits)^2 so a dense solve is cheap
+        gram = (design.T @ design).toarray() + self.alpha * np.eye(design.shape[1])
+        coef = scl.solve(gram, design.T @ (target - intercept), assume_a="pos")
+
+        self.labels = [None] * len(trait_matrix.columns)
+        for (trait_type, value), col in trait_matrix.columns.items():
+            self.labels[col] = value + " " + trait_type
+
+        self.intercept = float(intercept)
+        self.coef = coef
+        # Every token is appraised in a single sparse matrix-vector product
+        self.predictions = np.exp(trait_matrix.matrix @ coef + intercept)
+        self.n_observations = int(observed.sum())
+        self.trait_matrix = trait_matrix
+        logger.info(f"Fitted price model on {self.n_observations} prices and {len(self.labels)} traits")
+        return self
+
+    def predict(self, token_id: str) -> float:
+        return float(self.predictions[self.trait_matrix.positions[token_id]])
+
+    def predict_assets(self, assets: list) -> np.ndarray:
+        """Appraise assets which may not be part of the fitted data, traits unseen during fitting are ignored."""
+        rows, cols = [], []
+        for row, asset in enumerate(assets):
+            for trait in asset["traits"] or []:
+                col = self.trait_matrix.columns.get((trait["trait_type"], str(trait["value"])))
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+
+        design = sps.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(assets), len(self.coef)))
+        design.data[:] = 1
+        return np.exp(design @ self.coef + self.intercept)
+
+    def get_trait_contributions(self, token_id: str) -> Dict[str, float]:
+        """Value in ETH that each trait adds to the token's estimate, most valuable first."""
+        row = self.trait_matrix.positions[token_id]
+        cols = self.trait_matrix.matrix[row].indices
+        estimate = self.predictions[row]
+
+        # Price lost if the trait were removed, estimate * (1 - exp(-weight))
+        contributions = {self.labels[col]: float(estimate * -np.expm1(-self.coef[col])) for col in cols}
+        return dict(sorted(contributions.items(), key=lambda item: item[1], reverse=True))
+
+    def appraise(self, token_id: str) -> dict:
+        return {"price": self.predict(token_id), "contributions": self.get_trait_contributions(token_id)}
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+MIT License
+
+Copyright (c) 2021 Dinesh Pinto
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sps
+
+from .opensea_api import get_listing_price
+
+
+class TraitMatrix:
+    """Sparse token x trait matrix, with one column per (trait_type, value) pair."""
+
+    def __init__(self, asset_data: list, hot_query_threshold: int = 3, max_cached_neighbors: int = 1000):
+        self.token_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.columns: Dict[Tuple[str, str], int] = {}
+        self.prices = np.array([get_listing_price(asset) for asset in asset_data])
+
+        rows, cols = [], []
+        for row, asset in enumerate(asset_data):
+            self.token_ids.append(asset["token_id"])
+            self.positions[asset["token_id"]] = row
+            for trait in asset["traits"] or []:
+                key = (trait["trait_type"], str(trait["value"]))
+                col = self.columns.setdefault(key, len(self.columns))
+                rows.append(row)
+                cols.append(col)
+
+        self.matrix = sps.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                     shape=(len(asset_data), len(self.columns)))
+        # Duplicate (row, col) entries are summed by scipy, clip them back to a binary matrix
+        self.matrix.data[:] = 1
+        self.row_counts = np.asarray(self.matrix.sum(axis=1)).ravel()
+
+        # Rarer traits say more about a token, weigh them by inverse document frequency
+        document_frequency = np.asarray(self.matrix.sum(axis=0)).ravel()
+        self.idf = np.log(len(asset_data) / np.maximum(document_frequency, 1)).astype(np.float32)
+        self.weighted_matrix = (self.matrix @ sps.diags(self.idf)).tocsr()
+        self.weighted_row_totals = np.asarray(self.weighted_matrix.sum(axis=1)).ravel()
+
+        self.hot_query_threshold = hot_query_threshold
+        self.max_cached_neighbors = max_cached_neighbors
+        self._query_counts = Counter()
+        self._neighbors: Dict[Tuple[str, int, str], List[Tuple[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.token_ids)
+
+    def scores(self, token_id: str, method: str = "jaccard") -> np.ndarray:
+        row = self.positions[token_id]
+        if method == "jaccard":
+            intersection = (self.matrix @ self.matrix[row].T).toarray().ravel()
+            union = self.row_counts + self.row_counts[row] - intersection
+            return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        elif method == "weighted":
+            overlap = (self.weighted_matrix @ self.matrix[row].T).toarray().ravel()
+            total = self.weighted_row_totals[row]
+            return overlap / total if total > 0 else np.zeros_like(overlap)
+        else:
+            raise ValueError(f"Unknown similarity method {method}")
+
+    def most_similar(self, token_id: str, k: int = 5, method: str = "jaccard") -> List[Tuple[str, float]]:
+        """Return the k most similar tokens (excluding the token itself) as (token_id, score) pairs."""
+        key = (token_id, k, method)
+        if key in self._neighbors:
+            return self._neighbors[key]
+
+        neighbors = self._compute_neighbors(token_id, k, method)
+
+        # Keep the neighbor lists of frequently requested tokens around
+        self._query_counts[key] += 1
+        if self._query_counts[key] >= self.hot_query_threshold and len(self._neighbors) < self.max_cached_neighbors:
+            self._neighbors[key] = neighbors
+        return neighbors
+
+    def precompute_neighbors(self, token_ids: list, k: int = 5, method: str = "jaccard"):
+        for token_id in token_ids:
+            if token_id in self.positions:
+                self._neighbors[(token_id, k, method)] = self._compute_neighbors(token_id, k, method)
+
+    def _compute_neighbors(self, token_id: str, k: int, method: str) -> List[Tuple[str, float]]:
+        scores = self.scores(token_id, method)
+        scores[self.positions[token_id]] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.token_ids[idx], float(scores[idx])) for idx in top]
+
+    def get_price(self, token_id: str) -> Optional[float]:
+        price = self.prices[self.positions[token_id]]
+        return None if np.isnan(price) else float(price)
+
+
+class TraitBitmapIndex:
+    """
+    Inverted index from (trait_type, value) to a bitmap of token positions. Bitmaps are packed into uint64 words,
+    so that AND/OR/NOT over the whole collection are a handful of vectorized word operations.
+    """
+
+    SORT_FIELDS = ("price", "iq")
+
+    def __init__(self, asset_data: list, iqs: dict):
+        self.size = len(asset_data)
+        self.n_words = (self.size + 63) // 64
+        self.token_ids = [asset["token_id"] for asset in asset_data]
+        self.prices = np.array([get_listing_price(asset) for asset in asset_data])
+        self.iqs = np.array([iqs.get(asset["token_id"], np.nan) for asset in asset_data], dtype=float)
+
+        trait_positions: Dict[Tuple[str, str], List[int]] = {}
+        for position, asset in enumerate(asset_data):
+            for trait in asset["traits"] or []:
+                key = (str(trait["trait_type"]).lower(), str(trait["value"]).lower())
+                trait_positions.setdefault(key, []).append(position)
+
+        self.bitmaps = {key: self._from_mask(self._mask_from_positions(positions))
+                        for key, positions in trait_positions.items()}
+        self.full = self._from_mask(np.ones(self.size, dtype=bool))
+        self.listed = self._from_mask(~np.isnan(self.prices))
+
+    def _mask_from_positions(self, positions: list) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _from_mask(self, mask: np.ndarray) -> np.ndarray:
+        padded = np.zeros(self.n_words * 64, dtype=bool)
+        padded[:self.size] = mask
+        return np.packbits(padded, bitorder="little").view(np.uint64)
+
+    def _range_bitmap(self, values: np.ndarray, low: Optional[float], high: Optional[float],
+                      low_inclusive: bool = True, high_inclusive: bool = True) -> np.ndarray:
+        # NaN (unlisted price, unknown IQ) never satisfies a range predicate
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low if low_inclusive else values > low
+        if high is not None:
+            mask &= values <= high if high_inclusive else values < high
+        return self._from_mask(mask)
+
+    def get(self, trait_type: str, value: str) -> np.ndarray:
+        bitmap = self.bitmaps.get((trait_type.lower(), value.lower()))
+        return bitmap if bitmap is not None else np.zeros(self.n_words, dtype=np.uint64)
+
+    def any_of(self, trait_type: str, values: list) -> np.ndarray:
+        result = np.zeros(self.n_words, dtype=np.uint64)
+        for value in values:
+            result |= self.get(trait_type, value)
+        return result
+
+    def get_trait_values(self, trait_type: str) -> list:
+        return [value for key_type, value in self.bitmaps if key_type == trait_type.lower()]
+
+    def positions(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(bitmap.view(np.uint8), bitorder="little")[:self.size])
+
+    def query(self, include: Optional[List[Tuple[str, List[str]]]] = None,
+              exclude: Optional[List[Tuple[str, List[str]]]] = None,
+              price_range: Tuple[Optional[float], Optional[float]] = (None, None),
+              iq_range: Tuple[Optional[float], Optional[float]] = (None, None),
+              listed_only: bool = False, sort_by: str = "price", descending: bool = False,
+              limit: Optional[int] = None) -> List[str]:
+        """
+        Return token ids matching every include clause (each clause is an OR over its values), none of the exclude
+        clauses and the price/IQ ranges, sorted by price or IQ. Ranges are inclusive, None leaves a side open.
+        """
+        result = (self.listed if listed_only else self.full).copy()
+        for trait_type, values in include or []:
+            result &= self.any_of(trait_type, values)
+        for trait_type, values in exclude or []:
+            result &= ~self.any_of(trait_type, values)
+        if price_range != (None, None):
+            result &= self._range_bitmap(self.prices, *price_range)
+        if iq_range != (None, None):
+            result &= self._range_bitmap(self.iqs, *iq_range)
+
+        positions = self.positions(result)
+        if sort_by not in self.SORT_FIELDS:
+            raise ValueError(f"Cannot sort by {sort_by}, choose one of {self.SORT_FIELDS}")
+        keys = self.prices[positions] if sort_by == "price" else self.iqs[positions]
+        # Missing values always sort last
+        keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+        if limit is not None and limit < len(positions):
+            # Only the first page (and anything tied with its last entry) needs to be sorted
+            threshold = np.partition(keys, limit - 1)[limit - 1] if limit > 0 else -np.inf
+            candidates = np.flatnonzero(keys <= threshold)
+            positions = positions[candidates[np.argsort(keys[candidates], kind="stable")][:limit]]
+        else:
+            positions = positions[np.argsort(keys, kind="stable")]
+        return [self.token_ids[position] for position in positions]
+
+
+def parse_filter_query(query: str) -> dict:
+    """
+    Parse a comma separated filter such as "hat=cowboy hat|beanie, eyes!=laser, price<0.5, iq>=120, sort=-iq" into
+    keyword arguments for TraitBitmapIndex.query.
+    """
+    include, exclude = [], []
+    ranges = {"price": [None, None], "iq": [None, None]}
+    kwargs = {"sort_by": "price", "descending": False}
+
+    for term in query.split(","):
+        term = term.strip()
+        if not term:
+            continue
+
+        match = re.match(r"^(price|iq)\s*(<=|>=|<|>|=)\s*([0-9.]+)$", term, re.IGNORECASE)
+        if match:
+            field, operator, value = match.group(1).lower(), match.group(2), float(match.group(3))
+            if operator in ("<", "<="):
+                ranges[field][1] = value if operator == "<=" else np.nextafter(value, -np.inf)
+            elif operator in (">", ">="):
+                ranges[field][0] = value if operator == ">=" else np.nextafter(value, np.inf)
+            else:
+                ranges[field] = [value, value]
+            continue
+
+        if term.lower().startswith("sort="):
+            sort_by = term[len("sort="):].strip().lower()
+            kwargs["descending"] = sort_by.startswith("-")
+            kwargs["sort_by"] = sort_by.lstrip("-")
+            continue
+
+        if "!=" in term:
+            trait_type, values = term.split("!=", 1)
+            exclude.append((trait_type.strip(), [value.strip() for value in values.split("|")]))
+        elif "=" in term:
+            trait_type, values = term.split("=", 1)
+            include.append((trait_type.strip(), [value.strip() for value in values.split("|")]))
+        else:
+            raise ValueError(f"Could not understand filter '{term}'")
+
+    kwargs["include"] = include
+    kwargs["exclude"] = exclude
+    kwargs["price_range"] = tuple(ranges["price"])
+    kwargs["iq_range"] = tuple(ranges["iq"])
+    return kwargs
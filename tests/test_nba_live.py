@@ -0,0 +1,47 @@
+import datetime
+import os
+
+from src.nba_live import LiveScoreTracker, RecordedFeedScoreSource
+
+FEED = os.path.join(os.path.dirname(__file__), "data", "live_feed.json")
+
+
+def test_poll_reports_only_changes():
+    tracker = LiveScoreTracker(RecordedFeedScoreSource(FEED))
+
+    # Seeding poll, the already finished game must not be re-posted after a restart
+    assert tracker.poll() == []
+    assert set(tracker.games) == {"0022100001", "0022100002"}
+
+    live = tracker.poll()
+    assert [(game["game_id"], game["state"], game["home_score"]) for game in live] == [("0022100002", "live", 12)]
+
+    assert tracker.poll() == []
+
+    final = tracker.poll()
+    assert [(game["game_id"], game["state"], game["away_score"]) for game in final] == [("0022100002", "final", 121)]
+
+    # The recording is exhausted, the last snapshot repeats without changes
+    assert tracker.poll() == []
+
+
+def test_next_interval_backs_off():
+    tracker = LiveScoreTracker(RecordedFeedScoreSource(FEED), live_interval=20, idle_interval=900,
+                               pregame_window=datetime.timedelta(minutes=15))
+    start_time = datetime.datetime(2021, 10, 20, 2, 0)
+
+    tracker.poll()
+    # Scheduled game hours away, idle interval
+    assert tracker.next_interval(now=start_time - datetime.timedelta(hours=3)) == 900
+    # Idle, but wake up in time for the pregame window
+    assert tracker.next_interval(now=start_time - datetime.timedelta(minutes=20)) == 300
+    # Within the pregame window
+    assert tracker.next_interval(now=start_time - datetime.timedelta(minutes=10)) == 20
+
+    tracker.poll()
+    assert tracker.next_interval(now=start_time) == 20
+
+    tracker.poll()
+    tracker.poll()
+    # Every game is final
+    assert tracker.next_interval(now=start_time + datetime.timedelta(hours=3)) == 900
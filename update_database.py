@@ -26,9 +26,11 @@ SOFTWARE.
 import os
 
 from config import CONTRACT_ADDRESS
+from src.log_setup import setup_logging
 from src.nft_analytics import NFTAnalytics
 
 if __name__ == "__main__":
+    setup_logging("logfile.log")
     cbd = NFTAnalytics(CONTRACT_ADDRESS)
     DATA_FOLDER = os.path.join("data")
     asset_data = cbd.fetch_data(max_offset=10000)